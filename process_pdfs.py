@@ -2,7 +2,17 @@ import os
 import pickle
 import json
 import sys
+import io
+import fcntl
+import time
+import queue
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
 import pdfplumber
 from statistics import mean, mode
 from thefuzz import process
@@ -29,14 +39,88 @@ def extract_features(line_data):
         'is_top_of_page': 1 if line_data.get('y0', 1000) < line_data.get('page_height', 800) * 0.15 else 0,
     }
 
+def is_confident_body_text(line_data, rules):
+    """
+    First stage of the classification cascade. Returns True for lines that are
+    confidently body text (long or lowercase-leading, at body font size, not bold)
+    so they can skip the Random Forest entirely.
+    """
+    text = line_data['text']
+    font_size = line_data.get('size', 0)
+    avg_font_size = line_data.get('avg_size', 1)
+    relative_size = font_size / avg_font_size if avg_font_size > 0 else 0
+
+    if 'bold' in line_data.get('font', '').lower():
+        return False
+    if relative_size > rules['max_relative_size']:
+        return False
+    if len(text) >= rules['min_length']:
+        return True
+    return rules['skip_lowercase_start'] and text[:1].islower()
+
+# --- Shared Model Hosting Logic ---
+class SharedForestModel:
+    """
+    Read-only Random Forest evaluated straight from the memory-mapped node
+    arrays exported by train.py, so every worker on a node shares one copy of
+    the model through the page cache instead of unpickling its own. Drop-in
+    for the scikit-learn pipeline: predict() takes the same feature dicts.
+    """
+    TREE_CHUNK = 25
+
+    def __init__(self, model_dir):
+        with open(os.path.join(model_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.vocabulary = {name: i for i, name in enumerate(meta['feature_names'])}
+        self.classes = np.array(meta['classes'])
+        self.max_depth = meta['max_depth']
+        for name in ('left', 'right', 'feature', 'threshold', 'proba', 'roots'):
+            # np.asarray drops the memmap subclass but keeps the mapped, read-only buffer
+            setattr(self, name, np.asarray(np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode='r')))
+
+    def predict(self, X_dicts):
+        # Same input handling as DictVectorizer followed by the forest's float32 cast
+        X = np.zeros((len(X_dicts), len(self.vocabulary)))
+        for row, features in enumerate(X_dicts):
+            for name, value in features.items():
+                col = self.vocabulary.get(name)
+                if col is not None:
+                    X[row, col] = value
+        X = X.astype(np.float32)
+
+        # Walk a chunk of trees for every row at once, one level per iteration,
+        # keeping only the (row, tree) pairs that have not reached a leaf yet.
+        # Chunking bounds the temporaries at (rows x TREE_CHUNK) entries.
+        proba = np.zeros((len(X_dicts), self.proba.shape[1]))
+        for first in range(0, len(self.roots), self.TREE_CHUNK):
+            roots = self.roots[first:first + self.TREE_CHUNK]
+            node = np.tile(roots, len(X_dicts))
+            active = np.arange(node.size)
+            for _ in range(self.max_depth + 1):
+                current = node[active]
+                left = self.left[current]
+                internal = left != -1
+                if not internal.any():
+                    break
+                active, current, left = active[internal], current[internal], left[internal]
+                go_left = X[active // len(roots), self.feature[current]] <= self.threshold[current]
+                node[active] = np.where(go_left, left, self.right[current])
+            node = node.reshape(len(X_dicts), len(roots))
+
+            # Accumulate tree by tree, in the same order as predict_proba
+            for tree in range(len(roots)):
+                proba += self.proba[node[:, tree]]
+        return self.classes[np.argmax(proba, axis=1)]
+
 # --- PDF Processing Logic ---
-def get_line_data_from_pdf(pdf_path):
+def get_line_data_from_pdf(pdf_path, pdf_bytes=None):
     """
     Extracts rich data for each line of text from a PDF for prediction.
+    When pdf_bytes is given the PDF is parsed from memory and pdf_path only names it.
     """
     lines = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        with pdfplumber.open(io.BytesIO(pdf_bytes) if pdf_bytes is not None else pdf_path) as pdf:
             for page in pdf.pages:
                 words = [w for w in page.extract_words(x_tolerance=2, y_tolerance=2) if 'y0' in w]
                 all_font_sizes = [w['size'] for w in words if 'size' in w]
@@ -76,17 +160,258 @@ def get_line_data_from_pdf(pdf_path):
         print(f"Error reading {os.path.basename(pdf_path)}: {e}", file=sys.stderr)
     return lines
 
-def predict_structure(model, pdf_path):
+# --- Repeated Header/Footer Logic ---
+# Running headers, footers and page numbers repeat on every page; they are
+# dropped before featurization so they are neither classified nor outlined.
+REPEAT_EDGE_LINES = 3  # lines at the top and bottom of a page checked when positions are unknown
+REPEAT_Y0_BAND = 5  # points
+REPEAT_MIN_PAGES = 3
+REPEAT_MIN_PAGE_FRACTION = 0.5
+_DIGITS = re.compile(r'\d+')
+
+def _repeat_keys(page_lines):
     """
-    Uses the trained model to predict the JSON structure of a new PDF.
-    This version is for inference only and does not apply post-processing fixes.
+    Yields (line index, key) pairs for a page. A key combines the line's
+    position, either its y0 band or its slot from the top or bottom of the
+    page, with its normalized text, where digits are masked so page numbers match.
+    """
+    has_positions = any(line['y0'] for _, line in page_lines)
+    last = len(page_lines) - 1
+    for slot, (idx, line) in enumerate(page_lines):
+        if not has_positions and REPEAT_EDGE_LINES <= slot <= last - REPEAT_EDGE_LINES:
+            continue
+        text = _DIGITS.sub('#', ' '.join(line['text'].lower().split()))
+        if has_positions:
+            yield idx, (round(line['y0'] / REPEAT_Y0_BAND), text)
+            continue
+        if slot < REPEAT_EDGE_LINES:
+            yield idx, (("top", slot), text)
+        if last - slot < REPEAT_EDGE_LINES:
+            yield idx, (("bottom", last - slot), text)
+
+def remove_repeated_lines(lines):
+    """
+    Drops lines whose key recurs on at least half of the document's pages,
+    except on the first page, so a title or heading that also runs as the
+    page header still reaches the outline. Returns the remaining lines and how
+    many were removed.
+    """
+    pages = {}
+    for idx, line in enumerate(lines):
+        pages.setdefault(line['page'], []).append((idx, line))
+    if len(pages) < REPEAT_MIN_PAGES:
+        return lines, 0
+    min_pages = max(REPEAT_MIN_PAGES, len(pages) * REPEAT_MIN_PAGE_FRACTION)
+
+    key_pages = {}
+    line_keys = []
+    for page_num, page_lines in pages.items():
+        for idx, key in _repeat_keys(page_lines):
+            key_pages.setdefault(key, set()).add(page_num)
+            line_keys.append((idx, page_num, key))
+
+    first_page = min(pages)
+    repeated = {idx for idx, page_num, key in line_keys
+                if page_num != first_page and len(key_pages[key]) >= min_pages}
+    return [line for idx, line in enumerate(lines) if idx not in repeated], len(repeated)
+
+# --- Near-Duplicate Detection Logic ---
+# Templated PDFs (the same form filled in differently) produce mostly identical
+# lines. Each document gets a MinHash signature over its line keys; a near-duplicate
+# found in the on-disk index lends its stored labels to every line whose key matches.
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 16  # 2 rows per band: a document at Jaccard 0.5 is a candidate 99% of the time
+MINHASH_MIN_SIMILARITY = 0.5
+# Multiply-xorshift hash family over uint64 line keys; the multipliers must be odd.
+_MINHASH_RNG = np.random.default_rng(0x5EED)
+_MINHASH_MULT = _MINHASH_RNG.integers(1, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_MINHASH_ADD = _MINHASH_RNG.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def line_key(line_data):
+    """
+    Hashes everything the classifier sees about a line (text, font, layout and
+    page), so two lines with the same key always receive the same label.
+    """
+    raw = f"{line_data['text']}|{line_data['page']}|{line_data['size']}|{line_data['font']}|" \
+          f"{line_data['y0']}|{line_data['page_height']}|{line_data['avg_size']}"
+    return int.from_bytes(hashlib.blake2b(raw.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def minhash(keys):
     """
-    lines = get_line_data_from_pdf(pdf_path)
-    if not lines: return {"title": "", "outline": []}
+    Computes a MinHash signature from a document's line keys, evaluating all
+    permutations at once over a uint64 array (arithmetic wraps modulo 2**64).
+    """
+    values = np.fromiter(keys, dtype=np.uint64, count=len(keys))[:, None]
+    with np.errstate(over='ignore'):
+        hashed = values * _MINHASH_MULT + _MINHASH_ADD
+    hashed ^= hashed >> np.uint64(29)
+    return hashed.min(axis=0).tolist()
+
+def _signature_bands(signature):
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(MINHASH_BANDS)]
+
+def model_fingerprint(paths):
+    """
+    Hashes the model and cascade files that produced the stored labels. A
+    missing file (e.g. no cascade rules) hashes differently from a present one.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        digest.update(str(path).encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+def _read_index_file(index_path, fingerprint, report=True):
+    """
+    Returns the documents and per-line cost stored on disk, or nothing when the
+    file is missing or was written for a different model or cascade.
+    """
+    if not index_path or not os.path.exists(index_path):
+        return [], 0.0
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except Exception as e:
+        print(f"Error reading signature index {index_path}: {e}", file=sys.stderr)
+        return [], 0.0
+    if stored.get("fingerprint") != fingerprint:
+        if report:
+            print(f"Signature index {index_path} was built for a different model; starting a new one.")
+        return [], 0.0
+    return stored["documents"], stored.get("seconds_per_line", 0.0)
+
+def load_signature_index(index_path, fingerprint, max_documents=1000):
+    """
+    Loads the on-disk signature index (or starts an empty one) and builds the
+    in-memory band buckets used to find near-duplicate candidates. Stored
+    labels are only reused if the index was built with the same fingerprint.
+    """
+    documents, seconds_per_line = _read_index_file(index_path, fingerprint)
+    index = {"path": index_path, "fingerprint": fingerprint, "max_documents": max_documents,
+             "documents": [], "buckets": {}, "signatures": set(), "seconds_per_line": seconds_per_line}
+    for doc in documents[-max_documents:]:
+        add_to_signature_index(index, doc["signature"], dict(zip(doc["keys"], doc["labels"])))
+    return index
+
+def find_near_duplicate(index, signature):
+    """
+    Returns the index of the most similar indexed document whose estimated
+    Jaccard similarity is at least MINHASH_MIN_SIMILARITY, or None.
+    """
+    candidates = set()
+    for band in _signature_bands(signature):
+        candidates.update(index["buckets"].get(band, ()))
+
+    best, best_similarity = None, MINHASH_MIN_SIMILARITY
+    for doc_idx in candidates:
+        stored = index["documents"][doc_idx]["signature"]
+        similarity = sum(x == y for x, y in zip(stored, signature)) / MINHASH_PERMUTATIONS
+        if similarity > best_similarity or (similarity == best_similarity and best is None):
+            best, best_similarity = doc_idx, similarity
+    return best
+
+def add_to_signature_index(index, signature, labels):
+    """
+    Records a processed document's signature and its {line key: label} map,
+    unless a document with the same signature is already indexed. Past
+    max_documents the oldest documents are dropped and the buckets rebuilt,
+    so a long run keeps a bounded index in memory.
+    """
+    if tuple(signature) in index["signatures"]:
+        return
+    index["signatures"].add(tuple(signature))
+    index["documents"].append({"signature": signature, "labels": labels})
+    if len(index["documents"]) > index["max_documents"]:
+        index["documents"] = index["documents"][-index["max_documents"]:]
+        index["signatures"] = {tuple(doc["signature"]) for doc in index["documents"]}
+        index["buckets"] = {}
+        for doc_idx, doc in enumerate(index["documents"]):
+            for band in _signature_bands(doc["signature"]):
+                index["buckets"].setdefault(band, []).append(doc_idx)
+        return
+    for band in _signature_bands(signature):
+        index["buckets"].setdefault(band, []).append(len(index["documents"]) - 1)
 
-    X_dicts = [extract_features(line) for line in lines]
-    predictions = model.predict(X_dicts)
+def save_signature_index(index):
+    """
+    Writes the most recent documents of the index back to disk, along with the
+    last measured per-line classification cost used to estimate time saved.
+    Documents other workers saved in the meantime are kept: an exclusive lock
+    on a sidecar .lock file covers the read-merge-replace, and the file is
+    replaced atomically so readers never see a partial write.
+    """
+    if not index["path"]:
+        return
+    ours = [{"signature": doc["signature"], "keys": list(doc["labels"]), "labels": list(doc["labels"].values())}
+            for doc in index["documents"]]
+    seen = {tuple(doc["signature"]) for doc in ours}
+
+    directory = os.path.dirname(index["path"]) or "."
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(index["path"] + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the lock file is closed
+            theirs, _ = _read_index_file(index["path"], index["fingerprint"], report=False)
+            documents = [doc for doc in theirs if tuple(doc["signature"]) not in seen] + ours
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, suffix='.tmp', delete=False) as f:
+                tmp_path = f.name
+                json.dump({"fingerprint": index["fingerprint"],
+                           "documents": documents[-index["max_documents"]:],
+                           "seconds_per_line": index["seconds_per_line"]}, f)
+            os.replace(tmp_path, index["path"])
+    except Exception as e:
+        print(f"Error saving signature index {index['path']}: {e}", file=sys.stderr)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
+def classify_batch(model, docs_lines, cascade_rules=None, stats=None, known_labels=None):
+    """
+    Labels the lines of several documents with a single model call. Candidate
+    features from every document are stacked into one matrix and the
+    predictions are split back per document by offset. Lines with a label in
+    known_labels (one {line index: label} dict per document) are reused as is,
+    and when cascade rules are given, confident body text is labelled TEXT up
+    front; neither reaches the model.
+    """
+    doc_predictions = [["TEXT"] * len(lines) for lines in docs_lines]
+    candidates = []  # (document index, line index) for every line sent to the model
+    reused = skipped = 0
+    for doc_idx, lines in enumerate(docs_lines):
+        known = known_labels[doc_idx] if known_labels else {}
+        for line_idx, line in enumerate(lines):
+            if line_idx in known:
+                doc_predictions[doc_idx][line_idx] = known[line_idx]
+                reused += 1
+            elif cascade_rules and is_confident_body_text(line, cascade_rules):
+                skipped += 1
+            else:
+                candidates.append((doc_idx, line_idx))
+
+    start = time.perf_counter()
+    if candidates:
+        X_dicts = [extract_features(docs_lines[d][i]) for d, i in candidates]
+        for (d, i), pred in zip(candidates, model.predict(X_dicts)):
+            doc_predictions[d][i] = pred
+
+    if stats is not None:
+        stats['lines'] = stats.get('lines', 0) + sum(len(lines) for lines in docs_lines)
+        stats['skipped'] = stats.get('skipped', 0) + skipped
+        stats['reused'] = stats.get('reused', 0) + reused
+        stats['classified'] = stats.get('classified', 0) + len(candidates)
+        stats['classify_seconds'] = stats.get('classify_seconds', 0.0) + time.perf_counter() - start
+        stats['predict_calls'] = stats.get('predict_calls', 0) + (1 if candidates else 0)
+    return doc_predictions
+
+def build_structure(lines, predictions):
+    """
+    Assembles the title and outline JSON from a document's labelled lines.
+    """
     title = ""
     outline = []
     for line_data, pred in zip(lines, predictions):
@@ -104,6 +429,193 @@ def predict_structure(model, pdf_path):
     
     return {"title": title.strip(), "outline": outline}
 
+def classify_documents(model, docs_lines, cascade_rules=None, stats=None, signature_index=None):
+    """
+    Classifies the extracted lines of a micro-batch of documents with one model
+    call and returns one JSON per document.
+    """
+    known_labels = None
+    if signature_index is not None:
+        start = time.perf_counter()
+        docs_keys = [[line_key(line) for line in lines] for lines in docs_lines]
+        signatures = [minhash(keys) if keys else [] for keys in docs_keys]
+        matches = [find_near_duplicate(signature_index, signature) if keys else None
+                   for keys, signature in zip(docs_keys, signatures)]
+        known_labels = []
+        for keys, match in zip(docs_keys, matches):
+            if match is None:
+                known_labels.append({})
+                continue
+            stored = signature_index["documents"][match]["labels"]
+            known_labels.append({i: stored[key] for i, key in enumerate(keys) if key in stored})
+            if stats is not None:
+                stats['near_duplicates'] = stats.get('near_duplicates', 0) + 1
+        signature_seconds = time.perf_counter() - start
+
+    doc_predictions = classify_batch(model, docs_lines, cascade_rules, stats, known_labels)
+
+    if signature_index is not None:
+        start = time.perf_counter()
+        for keys, signature, match, known, preds in zip(docs_keys, signatures, matches, known_labels, doc_predictions):
+            # A document whose every line was reused adds nothing the index lacks
+            if keys and not (match is not None and len(known) == len(keys)):
+                add_to_signature_index(signature_index, signature, dict(zip(keys, preds)))
+        signature_seconds += time.perf_counter() - start
+        if stats is not None:
+            stats['signature_seconds'] = stats.get('signature_seconds', 0.0) + signature_seconds
+    return [build_structure(lines, preds) for lines, preds in zip(docs_lines, doc_predictions)]
+
+def predict_structure(model, pdf_path, cascade_rules=None, stats=None):
+    """
+    Uses the trained model to predict the JSON structure of a new PDF.
+    This version is for inference only and does not apply post-processing fixes.
+    """
+    lines, removed, _ = _parse_pdf_bytes(str(pdf_path), Path(pdf_path).read_bytes())
+    if stats is not None:
+        stats['repeated'] = stats.get('repeated', 0) + removed
+    return classify_documents(model, [lines], cascade_rules, stats)[0]
+
+# --- Staged Pipeline Logic ---
+# main() runs each stage concurrently, connected by bounded queues: a reader
+# thread prefetches PDF bytes, a process pool parses them from memory, the main
+# thread classifies micro-batches and a writer thread saves the JSON outputs.
+PIPELINE_STAGES = ("read", "parse", "infer", "write")
+
+def _parse_pdf_bytes(name, pdf_bytes):
+    """
+    Process-pool entry point: parses a PDF from its bytes, drops repeated
+    headers and footers, and reports how many were removed and the time taken.
+    """
+    start = time.perf_counter()
+    lines, removed = remove_repeated_lines(get_line_data_from_pdf(name, pdf_bytes))
+    return lines, removed, time.perf_counter() - start
+
+def _take(in_queue, metrics):
+    """
+    Takes the next item from a stage's input queue, sampling the queue depth first.
+    """
+    depth = in_queue.qsize()
+    metrics['depth_sum'] += depth
+    metrics['depth_samples'] += 1
+    metrics['depth_max'] = max(metrics['depth_max'], depth)
+    return in_queue.get()
+
+def _read_stage(pdf_files, out_queue, metrics):
+    for pdf_file in pdf_files:
+        start = time.perf_counter()
+        try:
+            pdf_bytes = pdf_file.read_bytes()
+        except OSError as e:
+            print(f"Error reading {pdf_file.name}: {e}", file=sys.stderr)
+            pdf_bytes = b""
+        metrics['busy'] += time.perf_counter() - start
+        metrics['items'] += 1
+        out_queue.put((pdf_file, pdf_bytes))
+    out_queue.put(None)
+
+def _parse_stage(pool, in_queue, out_queue, metrics):
+    # Futures are queued in input order; the bounded queue limits how many
+    # documents are parsed ahead of inference.
+    while True:
+        item = _take(in_queue, metrics)
+        if item is None:
+            out_queue.put(None)
+            return
+        pdf_file, pdf_bytes = item
+        out_queue.put((pdf_file, pool.submit(_parse_pdf_bytes, pdf_file.name, pdf_bytes)))
+
+def _write_stage(output_dir, in_queue, metrics):
+    while True:
+        item = _take(in_queue, metrics)
+        if item is None:
+            return
+        pdf_file, predicted_json = item
+        start = time.perf_counter()
+        output_file = output_dir / f"{pdf_file.stem}.json"
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(predicted_json, f, indent=4)
+            print(f"Successfully generated {output_file.name}")
+        except Exception as e:
+            print(f"Error saving JSON for {pdf_file.name}: {e}", file=sys.stderr)
+        metrics['busy'] += time.perf_counter() - start
+        metrics['items'] += 1
+
+def run_pipeline(model, pdf_files, output_dir, batch_size, parse_workers, prefetch,
+                 cascade_rules=None, stats=None, signature_index=None):
+    """
+    Processes the PDFs through the staged pipeline and returns per-stage metrics:
+    items handled, busy seconds, and the depth of each stage's input queue.
+    """
+    metrics = {stage: {'items': 0, 'busy': 0.0, 'depth_sum': 0, 'depth_samples': 0, 'depth_max': 0}
+               for stage in PIPELINE_STAGES}
+    read_queue = queue.Queue(maxsize=prefetch)
+    parse_queue = queue.Queue(maxsize=parse_workers * 2)
+    write_queue = queue.Queue(maxsize=batch_size * 2)
+    start = time.perf_counter()
+
+    # Workers are started on demand while the reader and writer threads run;
+    # forking a multi-threaded process can copy a held lock into the child, so
+    # they come from a single-threaded forkserver instead.
+    with ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("forkserver")) as pool:
+        threads = [
+            threading.Thread(target=_read_stage, args=(pdf_files, read_queue, metrics['read']), daemon=True),
+            threading.Thread(target=_parse_stage, args=(pool, read_queue, parse_queue, metrics['parse']), daemon=True),
+            threading.Thread(target=_write_stage, args=(output_dir, write_queue, metrics['write']), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Inference stage: gather parsed documents into micro-batches on this thread.
+        batch = []
+        while True:
+            item = _take(parse_queue, metrics['infer'])
+            if item is not None:
+                pdf_file, future = item
+                lines, removed, parse_seconds = future.result()
+                if stats is not None:
+                    stats['repeated'] = stats.get('repeated', 0) + removed
+                metrics['parse']['busy'] += parse_seconds
+                metrics['parse']['items'] += 1
+                batch.append((pdf_file, lines))
+            if batch and (item is None or len(batch) >= batch_size):
+                infer_start = time.perf_counter()
+                predicted_jsons = classify_documents(model, [lines for _, lines in batch],
+                                                     cascade_rules, stats, signature_index)
+                metrics['infer']['busy'] += time.perf_counter() - infer_start
+                metrics['infer']['items'] += len(batch)
+                for (pdf_file, _), predicted_json in zip(batch, predicted_jsons):
+                    write_queue.put((pdf_file, predicted_json))
+                batch = []
+            if item is None:
+                write_queue.put(None)
+                break
+
+        for thread in threads:
+            thread.join()
+
+    wall = time.perf_counter() - start
+    for stage, stage_metrics in metrics.items():
+        capacity = wall * (parse_workers if stage == "parse" else 1)
+        stage_metrics['utilization'] = stage_metrics['busy'] / capacity if capacity > 0 else 0.0
+        samples = stage_metrics['depth_samples']
+        stage_metrics['avg_depth'] = stage_metrics['depth_sum'] / samples if samples else 0.0
+    metrics['wall'] = wall
+    return metrics
+
+def print_pipeline_metrics(metrics):
+    """
+    Prints per-stage utilization and input queue depth. The bottleneck is the
+    stage with the highest utilization, usually sitting behind a full queue.
+    Inference's input queue holds in-flight parse futures, so it fills up
+    whenever parsing is the bottleneck as well.
+    """
+    print(f"Pipeline finished in {metrics['wall']:.2f}s")
+    print(f"{'stage':<8}{'items':>7}{'busy (s)':>10}{'util':>8}{'avg queue':>11}{'max queue':>11}")
+    for stage in PIPELINE_STAGES:
+        m = metrics[stage]
+        print(f"{stage:<8}{m['items']:>7}{m['busy']:>10.2f}{m['utilization']:>8.0%}{m['avg_depth']:>11.1f}{m['depth_max']:>11}")
+
 def main():
     """
     Main function to process all PDFs in the input directory.
@@ -111,6 +623,27 @@ def main():
     input_dir = Path("/app/input")
     output_dir = Path("/app/output")
     model_path = Path("/app/models/doc_classifier.pkl")
+    # MODEL_HOSTING=shared evaluates the memory-mapped node arrays instead of
+    # unpickling the forest, so co-located workers share one copy of the model.
+    model_hosting = os.environ.get("MODEL_HOSTING", "pickle")
+    shared_model_dir = Path("/app/models/shared_forest")
+    cascade_path = Path("/app/models/cascade_rules.json")
+    # Number of PDFs classified per model call: larger batches amortize the
+    # pipeline overhead across documents, smaller ones return results sooner.
+    batch_size = max(1, int(os.environ.get("PDF_BATCH_SIZE", "8")))
+    # Parsing is CPU-bound and runs on a process pool; reading is prefetched
+    # ahead into a bounded buffer so slow input volumes do not stall it. The
+    # default follows the CPUs this process may run on; a `--cpus` quota is not
+    # visible here, so containers limited that way should set the variable.
+    if hasattr(os, "sched_getaffinity"):
+        available_cpus = len(os.sched_getaffinity(0))
+    else:
+        available_cpus = os.cpu_count() or 1
+    parse_workers = max(1, int(os.environ.get("PDF_PARSE_WORKERS", str(available_cpus))))
+    prefetch = max(1, int(os.environ.get("PDF_PREFETCH", str(parse_workers * 2))))
+    # Signatures of processed documents persist here so templated PDFs seen in
+    # earlier runs reuse their line labels; set to an empty string to disable.
+    signature_index_path = os.environ.get("SIGNATURE_INDEX", "/app/cache/signature_index.json")
 
     # Ensure the output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -118,12 +651,27 @@ def main():
     # Load the trained model
     print("Loading model...")
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        print("Model loaded successfully.")
-    except FileNotFoundError:
-        print(f"Error: Model not found at {model_path}. Make sure it's copied into the Docker image.", file=sys.stderr)
+        if model_hosting == "shared":
+            model = SharedForestModel(shared_model_dir)
+        else:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+        print(f"Model loaded successfully ({model_hosting} hosting).")
+    except FileNotFoundError as e:
+        print(f"Error: Model not found ({e.filename}). Make sure it's copied into the Docker image.", file=sys.stderr)
         sys.exit(1)
+
+    # The cascade prefilter is optional; without it every line goes to the forest.
+    # Rules that were disabled in training or miss their recall target stay off.
+    cascade_rules = None
+    if cascade_path.exists():
+        with open(cascade_path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if rules['max_relative_size'] < 0 or rules['heading_recall'] < rules.get('min_heading_recall', 0.0):
+            print("Cascade prefilter disabled (held-out heading recall below target).")
+        else:
+            cascade_rules = rules
+            print(f"Cascade prefilter enabled (held-out heading recall {cascade_rules['heading_recall']:.1%}).")
     
     pdf_files = list(input_dir.glob("*.pdf"))
     if not pdf_files:
@@ -131,24 +679,40 @@ def main():
         return
 
     print(f"Found {len(pdf_files)} PDF(s) to process...")
+    stats = {}
+    signature_index = None
+    if signature_index_path:
+        # Stored labels are only valid for the model and cascade that produced them
+        model_files = [cascade_path] + (sorted(shared_model_dir.glob("*")) if model_hosting == "shared" else [model_path])
+        signature_index = load_signature_index(signature_index_path, model_fingerprint(model_files))
 
-    for pdf_file in pdf_files:
-        print(f"Processing {pdf_file.name}...")
-        
-        # Predict the structure
-        predicted_json = predict_structure(model, pdf_file)
-        
-        # Define the output path
-        output_file = output_dir / f"{pdf_file.stem}.json"
-        
-        # Save the JSON output
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(predicted_json, f, indent=4)
-            print(f"Successfully generated {output_file.name}")
-        except Exception as e:
-            print(f"Error saving JSON for {pdf_file.name}: {e}", file=sys.stderr)
+    metrics = run_pipeline(model, pdf_files, output_dir, batch_size, parse_workers, prefetch,
+                           cascade_rules, stats, signature_index)
+    print_pipeline_metrics(metrics)
 
+    if stats.get('repeated'):
+        extracted = stats['repeated'] + stats.get('lines', 0)
+        print(f"Removed {stats['repeated']}/{extracted} repeated header/footer lines ({stats['repeated'] / extracted:.1%}).")
+    if cascade_rules and stats.get('lines'):
+        print(f"Cascade prefilter skipped {stats['skipped']}/{stats['lines']} lines ({stats['skipped'] / stats['lines']:.1%}).")
+        if stats.get('classified') and metrics['wall'] > 0:
+            # Skipped lines would have cost about as much as the ones classified
+            avoided = stats['skipped'] * stats['classify_seconds'] / stats['classified']
+            print(f"Cascade prefilter saved ~{avoided * 1000:.1f} ms of classification, "
+                  f"~{(metrics['wall'] + avoided) / metrics['wall']:.2f}x end to end (parsing included).")
+    if signature_index is not None:
+        # Time saved is estimated from the per-line classification cost, measured
+        # in this run or, when every line was reused, remembered from an earlier one.
+        if stats.get('classified'):
+            signature_index['seconds_per_line'] = stats['classify_seconds'] / (stats['classified'] + stats['skipped'])
+        saved = stats.get('reused', 0) * signature_index['seconds_per_line']
+        save_signature_index(signature_index)
+        if stats.get('lines'):
+            print(f"Near-duplicate reuse: {stats.get('near_duplicates', 0)}/{len(pdf_files)} PDF(s) matched, "
+                  f"{stats['reused']}/{stats['lines']} lines ({stats['reused'] / stats['lines']:.1%}) reused, "
+                  f"net ~{(saved - stats.get('signature_seconds', 0.0)) * 1000:.1f} ms saved "
+                  f"({saved * 1000:.1f} ms classification avoided, {stats.get('signature_seconds', 0.0) * 1000:.1f} ms fingerprinting).")
+    print(f"Classified {len(pdf_files)} PDF(s) in {stats.get('predict_calls', 0)} model call(s) (batch size {batch_size}).")
     print("Processing complete.")
 
 if __name__ == '__main__':
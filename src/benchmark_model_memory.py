@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import pickle
+import argparse
+import multiprocessing as mp
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+MODEL_PATH = os.path.join(ROOT_DIR, 'models', 'doc_classifier.pkl')
+SHARED_MODEL_DIR = os.path.join(ROOT_DIR, 'models', 'shared_forest')
+TRAINING_DATA = os.path.join(ROOT_DIR, 'data', 'training_data.json')
+
+
+def _memory_kb():
+    """
+    Returns this process's (RSS, PSS, peak RSS) in KB. PSS splits shared pages
+    between the processes mapping them, so it shows what each worker really
+    costs; peak RSS (VmHWM) includes the temporaries of a predict call.
+    """
+    rss = pss = peak = None
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+            elif line.startswith('VmHWM:'):
+                peak = int(line.split()[1])
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss, peak
+
+
+def _worker(mode, rows, barrier, results):
+    import process_pdfs
+
+    before, _, _ = _memory_kb()
+    if mode == 'shared':
+        model = process_pdfs.SharedForestModel(SHARED_MODEL_DIR)
+    else:
+        with open(MODEL_PATH, 'rb') as f:
+            model = pickle.load(f)
+
+    with open(TRAINING_DATA, 'r', encoding='utf-8') as f:
+        X_dicts = [process_pdfs.extract_features(item) for item in json.load(f)]
+    # Repeat the training lines up to a realistic micro-batch size
+    X_dicts = (X_dicts * (rows // len(X_dicts) + 1))[:rows]
+    model.predict(X_dicts)
+
+    # Measure only once every worker has loaded the model and run inference
+    barrier.wait()
+    rss, pss, peak = _memory_kb()
+    results.put((rss, pss, rss - before, peak))
+    barrier.wait()
+
+
+def measure(mode, workers, rows):
+    """
+    Starts the given number of workers for a hosting mode, each predicting a
+    batch of the given number of rows, and returns their average RSS, PSS,
+    model-load RSS increase and peak RSS in MB.
+    """
+    ctx = mp.get_context('spawn')  # no copy-on-write sharing inherited from this process
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(mode, rows, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def average(i):
+        values = [sample[i] for sample in samples if sample[i] is not None]
+        return sum(values) / len(values) / 1024 if values else float('nan')
+
+    return average(0), average(1), average(2), average(3)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure per-worker memory for pickled vs shared model hosting.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    # A default micro-batch of 8 documents is roughly 4600 lines
+    parser.add_argument('--rows', type=int, default=4600, help="Rows per predict call.")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'workers':>8}{'RSS/worker':>12}{'PSS/worker':>12}{'peak RSS':>12}{'model load':>12}{'total PSS':>11}")
+    for mode in ('pickle', 'shared'):
+        for workers in args.workers:
+            rss, pss, load, peak = measure(mode, workers, args.rows)
+            print(f"{mode:<8}{workers:>8}{rss:>10.1f}MB{pss:>10.1f}MB{peak:>10.1f}MB{load:>10.1f}MB{pss * workers:>9.0f}MB")
@@ -0,0 +1,104 @@
+import re
+import time
+import argparse
+from refinement import refine_and_summarize_text, refine_ranked_sections
+
+
+def legacy_refine_and_summarize_text(section_text, job_description=""):
+    """
+    The original regex-based refinement, kept here as the reference the new
+    engine must match and as the baseline for the timings.
+    """
+    if "Ingredients:" in section_text and "Instructions:" in section_text:
+        parts = section_text.split("Instructions:")
+        ingredients = "Ingredients: " + parts[0].replace("Ingredients:", "").replace("\n", " ").strip()
+        instructions = "Instructions: " + parts[1].replace("\n", " ").strip()
+        return f"{ingredients}. {instructions}"
+
+    intro_search = re.search(r'^(.*?)(?=\n\s*[A-Z][a-zA-Z\s]+:|•)', section_text, re.DOTALL)
+    intro = intro_search.group(1).strip().replace('\n', ' ') if intro_search else ''
+
+    pattern = re.compile(r'([A-Z][A-Za-z\s]+):\n((?:\s*•[^\n]+\n?)+)')
+    matches = pattern.findall(section_text)
+
+    if matches:
+        prose_parts = [f"{sub.strip()}: " + "; ".join(
+            [item.strip() for item in bullets.strip().split('•') if item.strip()]
+        ) + "." for sub, bullets in matches]
+        summary = (intro + " " + " ".join(prose_parts)).strip()
+        return summary
+
+    bullets = [line.strip().lstrip('•').strip() for line in section_text.split('\n') if line.strip().startswith('•')]
+    if bullets:
+        main_title_search = re.search(r'^([A-Z][A-Za-z\s&’]+)', section_text)
+        main_title = main_title_search.group(1).strip() if main_title_search else ""
+        summary = f"{main_title}: " + "; ".join(bullets) + "."
+        return summary
+
+    return re.sub(r'\s+', ' ', section_text).strip()
+
+
+# Adversarial sections: long stretches of letters and whitespace with no bullet
+# and no colon, which make every newline and capital letter rescan to the end.
+ADVERSARIAL_CASES = {
+    "capitalized lines": "Planning Your Trip Along The Coast\n",
+    "single long line": "Coastal Adventures And Nightlife ",
+    "blank line runs": "Tips\n\n\n\n\n\n\n\n",
+}
+
+REALISTIC_SECTION = (
+    "The south of France offers a wide range of activities for groups.\n"
+    "Coastal Adventures:\n"
+    "• Beach hopping in Nice\n"
+    "• Sailing trips from Antibes\n"
+    "Nightlife:\n"
+    "• Bars in Marseille\n"
+    "• Clubs in Saint-Tropez\n"
+)
+
+
+def _make_section(unit, size):
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def _time(func, text):
+    start = time.perf_counter()
+    result = func(text)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(size_kb, legacy_max_kb):
+    """
+    Times both implementations on adversarial sections. The legacy version is
+    only run up to legacy_max_kb because its cost grows quadratically.
+    """
+    sizes = [kb for kb in (8, 16, 32, 64, 256, 1024) if kb <= size_kb]
+    if size_kb not in sizes:
+        sizes.append(size_kb)
+
+    print(f"{'case':<24}{'size':>8}{'legacy (s)':>14}{'engine (s)':>14}  match")
+    for name, unit in ADVERSARIAL_CASES.items():
+        for kb in sizes:
+            text = _make_section(unit, kb * 1024)
+            result, engine_time = _time(refine_and_summarize_text, text)
+            if kb <= legacy_max_kb:
+                expected, legacy_time = _time(legacy_refine_and_summarize_text, text)
+                legacy_cell, match = f"{legacy_time:.4f}", "yes" if result == expected else "NO"
+            else:
+                legacy_cell, match = "skipped", "-"
+            print(f"{name:<24}{kb:>6}KB{legacy_cell:>14}{engine_time:>14.4f}  {match}")
+
+    sections = [{"text": REALISTIC_SECTION}] * 1000
+    start = time.perf_counter()
+    refined = refine_ranked_sections(sections)
+    elapsed = time.perf_counter() - start
+    assert refined[0] == legacy_refine_and_summarize_text(REALISTIC_SECTION)
+    print(f"\nRefined a ranked list of {len(sections)} realistic sections in {elapsed * 1000:.1f} ms.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the text refinement engine against the legacy regexes.")
+    parser.add_argument("--size-kb", type=int, default=1024, help="Largest adversarial section size in KB.")
+    parser.add_argument("--legacy-max-kb", type=int, default=64, help="Largest size the legacy regexes are run on.")
+    args = parser.parse_args()
+    run_benchmark(args.size_kb, args.legacy_max_kb)
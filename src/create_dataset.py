@@ -113,6 +113,7 @@ def run_automated_labeling(data_dir, output_file):
                         label = best_level
 
             line_info['label'] = label
+            line_info['document'] = pdf_file # Lets train.py hold out whole documents
             all_labeled_data.append(line_info)
             
     with open(output_file, 'w') as f:
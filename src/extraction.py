@@ -6,6 +6,7 @@ from datetime import datetime
 from pathlib import Path
 from sentence_transformers import SentenceTransformer, util
 from PyPDF2 import PdfReader
+from refinement import refine_ranked_sections
 import sys
 
 # Force the output encoding to UTF-8 to prevent errors on Windows
@@ -58,43 +59,6 @@ def extract_sections_from_doc(pages, filename):
     return sections
 
 
-def refine_and_summarize_text(section_text, job_description=""):
-    """
-    Intelligently summarizes text, adapting its strategy based on content.
-    """
-    # Strategy 1: For recipes (Ingredients/Instructions format)
-    if "Ingredients:" in section_text and "Instructions:" in section_text:
-        parts = section_text.split("Instructions:")
-        ingredients = "Ingredients: " + parts[0].replace("Ingredients:", "").replace("\n", " ").strip()
-        instructions = "Instructions: " + parts[1].replace("\n", " ").strip()
-        return f"{ingredients}. {instructions}"
-
-    # Strategy 2: For structured text with subheadings and bullet points
-    intro_search = re.search(r'^(.*?)(?=\n\s*[A-Z][a-zA-Z\s]+:|•)', section_text, re.DOTALL)
-    intro = intro_search.group(1).strip().replace('\n', ' ') if intro_search else ''
-
-    pattern = re.compile(r'([A-Z][A-Za-z\s]+):\n((?:\s*•[^\n]+\n?)+)')
-    matches = pattern.findall(section_text)
-
-    if matches:
-        prose_parts = [f"{sub.strip()}: " + "; ".join(
-            [item.strip() for item in bullets.strip().split('•') if item.strip()]
-        ) + "." for sub, bullets in matches]
-        summary = (intro + " " + " ".join(prose_parts)).strip()
-        return summary
-
-    # Strategy 3: For simple lists of bullet points
-    bullets = [line.strip().lstrip('•').strip() for line in section_text.split('\n') if line.strip().startswith('•')]
-    if bullets:
-        main_title_search = re.search(r'^([A-Z][A-Za-z\s&’]+)', section_text)
-        main_title = main_title_search.group(1).strip() if main_title_search else ""
-        summary = f"{main_title}: " + "; ".join(bullets) + "."
-        return summary
-
-    # Fallback for plain text
-    return re.sub(r'\s+', ' ', section_text).strip()
-
-
 def generate_contextual_query(persona, job):
     """Generates a specific, keyword-rich query based on the job description."""
     base_query = f"As a {persona}, I need to {job}."
@@ -163,8 +127,9 @@ def analyze_collection(collection_path):
 
     extracted_sections_output = []
     subsection_analysis_output = []
+    refined_texts = refine_ranked_sections(top_5_sections, job_task)
 
-    for i, section in enumerate(top_5_sections):
+    for i, (section, refined_text) in enumerate(zip(top_5_sections, refined_texts)):
         extracted_sections_output.append({
             "document": section["document"],
             "section_title": section["section_title"],
@@ -173,7 +138,7 @@ def analyze_collection(collection_path):
         })
         subsection_analysis_output.append({
             "document": section["document"],
-            "refined_text": refine_and_summarize_text(section["text"], job_task),
+            "refined_text": refined_text,
             "page_number": section["page_number"]
         })
     
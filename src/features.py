@@ -25,3 +25,22 @@ def extract_features(line_data):
         'is_top_of_page': 1 if line_data.get('y0', 1000) < line_data.get('page_height', 800) * 0.15 else 0,
     }
     return features
+
+def is_confident_body_text(line_data, rules):
+    """
+    First stage of the classification cascade. Returns True for lines that are
+    confidently body text (long or lowercase-leading, at body font size, not bold)
+    so they can skip the Random Forest entirely.
+    """
+    text = line_data['text']
+    font_size = line_data.get('size', 0)
+    avg_font_size = line_data.get('avg_size', 1)
+    relative_size = font_size / avg_font_size if avg_font_size > 0 else 0
+
+    if 'bold' in line_data.get('font', '').lower():
+        return False
+    if relative_size > rules['max_relative_size']:
+        return False
+    if len(text) >= rules['min_length']:
+        return True
+    return rules['skip_lowercase_start'] and text[:1].islower()
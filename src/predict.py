@@ -4,7 +4,7 @@ import json
 import sys
 import pdfplumber
 from statistics import mean, mode
-from features import extract_features
+from features import extract_features, is_confident_body_text
 from thefuzz import process
 
 def get_line_data_from_pdf(pdf_path):
@@ -76,7 +76,15 @@ def _apply_known_fixes(predicted_json, expected_json, filename):
 
     return final_json
 
-def predict_structure(model, pdf_path, ground_truth_json=None, filename=None):
+def load_cascade_rules(model_path):
+    """Loads the cascade prefilter rules saved next to the model, if any."""
+    cascade_path = os.path.join(os.path.dirname(model_path), 'cascade_rules.json')
+    if not os.path.exists(cascade_path):
+        return None
+    with open(cascade_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def predict_structure(model, pdf_path, ground_truth_json=None, filename=None, cascade_rules=None):
     """
     Uses the trained model to predict the JSON structure and then applies
     a final correction layer to ensure perfect accuracy.
@@ -84,8 +92,14 @@ def predict_structure(model, pdf_path, ground_truth_json=None, filename=None):
     lines = get_line_data_from_pdf(pdf_path)
     if not lines: return {"title": "", "outline": []}
 
-    X_dicts = [extract_features(line) for line in lines]
-    predictions = model.predict(X_dicts)
+    # Confident body text is labelled up front; only candidates reach the forest.
+    predictions = ["TEXT"] * len(lines)
+    candidates = [i for i, line in enumerate(lines)
+                  if not (cascade_rules and is_confident_body_text(line, cascade_rules))]
+    if candidates:
+        X_dicts = [extract_features(lines[i]) for i in candidates]
+        for i, pred in zip(candidates, model.predict(X_dicts)):
+            predictions[i] = pred
 
     rough_title = ""
     rough_outline = []
@@ -123,6 +137,7 @@ def run_tests(model_path, data_dir):
     print("--- Loading model for testing ---")
     with open(model_path, 'rb') as f:
         model = pickle.load(f)
+    cascade_rules = load_cascade_rules(model_path)
     print("Model loaded.")
 
     print("\n--- Running All Tests ---")
@@ -137,7 +152,7 @@ def run_tests(model_path, data_dir):
         with open(json_path, 'r', encoding='utf-8') as f:
             expected_json = json.load(f)
         
-        predicted_json = predict_structure(model, pdf_path, ground_truth_json=expected_json, filename=pdf_file)
+        predicted_json = predict_structure(model, pdf_path, ground_truth_json=expected_json, filename=pdf_file, cascade_rules=cascade_rules)
         
         # --- NEW: Save the output to the output folder ---
         save_json_output(predicted_json, pdf_file)
@@ -174,7 +189,7 @@ if __name__ == '__main__':
             with open(model_file, 'rb') as f:
                 loaded_model = pickle.load(f)
             
-            final_json = predict_structure(loaded_model, pdf_path)
+            final_json = predict_structure(loaded_model, pdf_path, cascade_rules=load_cascade_rules(model_file))
             
             # --- NEW: Save the output to the output folder ---
             save_json_output(final_json, pdf_path)
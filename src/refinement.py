@@ -0,0 +1,114 @@
+import re
+
+# Patterns are compiled once at import. Each one is a single character-class
+# run or a literal anchor, so matching is linear in the length of the text.
+_WHITESPACE_RUN = re.compile(r'\s*')
+_LETTER_RUN = re.compile(r'[a-zA-Z\s]*')
+_UPPERCASE = re.compile(r'[A-Z]')
+_MAIN_TITLE = re.compile(r'[A-Z][A-Za-z\s&’]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _find_intro_end(text):
+    """
+    Returns where the introduction ends: the first bullet, or the first newline
+    followed by a "Subheading:" (optionally after blank space), or None.
+    """
+    bullet = text.find('•')
+    limit = bullet if bullet != -1 else len(text)
+
+    pos = text.find('\n', 0, limit)
+    while pos != -1:
+        start = _WHITESPACE_RUN.match(text, pos + 1).end()
+        if start < len(text) and 'A' <= text[start] <= 'Z':
+            end = _LETTER_RUN.match(text, start + 1).end()
+            if end > start + 1 and end < len(text) and text[end] == ':':
+                return pos
+            # Every newline before `end` leads into this same run, so none can match.
+            pos = text.find('\n', end, limit)
+        else:
+            pos = text.find('\n', start, limit)
+
+    return bullet if bullet != -1 else None
+
+
+def _scan_bullet_lines(text, pos):
+    """
+    Consumes consecutive "• item" lines starting at pos and returns the end of
+    the last one, or None if there is no bullet line at pos.
+    """
+    end = None
+    while True:
+        bullet = _WHITESPACE_RUN.match(text, pos).end()
+        if bullet >= len(text) or text[bullet] != '•':
+            return end
+        line_end = text.find('\n', bullet + 1)
+        if line_end == -1:
+            line_end = len(text)
+        if line_end == bullet + 1:
+            return end  # a bullet needs at least one character of content
+        pos = end = min(line_end + 1, len(text))
+
+
+def _find_subheading_bullets(text):
+    """
+    Returns (subheading, bullet block) pairs for every "Subheading:" line that
+    is directly followed by one or more bullet lines.
+    """
+    matches = []
+    pos = 0
+    while True:
+        upper = _UPPERCASE.search(text, pos)
+        if not upper:
+            return matches
+        start = upper.start()
+        end = _LETTER_RUN.match(text, start + 1).end()
+        if end > start + 1 and text.startswith(':\n', end):
+            bullets_end = _scan_bullet_lines(text, end + 2)
+            if bullets_end is not None:
+                matches.append((text[start:end], text[end + 2:bullets_end]))
+                pos = bullets_end
+                continue
+        # Any subheading starting inside this run would end at the same place and fail too.
+        pos = max(end, start + 1)
+
+
+def refine_and_summarize_text(section_text, job_description=""):
+    """
+    Intelligently summarizes text, adapting its strategy based on content.
+    """
+    # Strategy 1: For recipes (Ingredients/Instructions format)
+    if "Ingredients:" in section_text and "Instructions:" in section_text:
+        parts = section_text.split("Instructions:")
+        ingredients = "Ingredients: " + parts[0].replace("Ingredients:", "").replace("\n", " ").strip()
+        instructions = "Instructions: " + parts[1].replace("\n", " ").strip()
+        return f"{ingredients}. {instructions}"
+
+    # Strategy 2: For structured text with subheadings and bullet points
+    matches = _find_subheading_bullets(section_text)
+    if matches:
+        intro_end = _find_intro_end(section_text)
+        intro = section_text[:intro_end].strip().replace('\n', ' ') if intro_end is not None else ''
+        prose_parts = [f"{sub.strip()}: " + "; ".join(
+            [item.strip() for item in bullets.strip().split('•') if item.strip()]
+        ) + "." for sub, bullets in matches]
+        summary = (intro + " " + " ".join(prose_parts)).strip()
+        return summary
+
+    # Strategy 3: For simple lists of bullet points
+    bullets = [line.strip().lstrip('•').strip() for line in section_text.split('\n') if line.strip().startswith('•')]
+    if bullets:
+        main_title_search = _MAIN_TITLE.match(section_text)
+        main_title = main_title_search.group(0).strip() if main_title_search else ""
+        summary = f"{main_title}: " + "; ".join(bullets) + "."
+        return summary
+
+    # Fallback for plain text
+    return _WHITESPACE.sub(' ', section_text).strip()
+
+
+def refine_ranked_sections(sections, job_description=""):
+    """
+    Refines the text of every section in a ranked list in one call, keeping the order.
+    """
+    return [refine_and_summarize_text(section["text"], job_description) for section in sections]
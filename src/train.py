@@ -1,16 +1,195 @@
 import os
 import pickle
 import json
+import time
+import sys
+import argparse
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.pipeline import make_pipeline
-from features import extract_features
-from create_dataset import run_automated_labeling
+from features import extract_features, is_confident_body_text
+from create_dataset import run_automated_labeling, get_line_data_from_pdf
 import traceback
 
-def train_model(data_dir, model_path):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from process_pdfs import SharedForestModel
+
+DISABLED_CASCADE = {'min_length': 0, 'max_relative_size': -1.0, 'skip_lowercase_start': False}
+
+def fit_cascade(training_data, min_heading_recall, length_margin=0, allow_lowercase_skip=True):
+    """
+    Searches for the most aggressive body-text prefilter rules that still keep
+    the recall on heading labels (everything except TEXT) at or above the threshold.
+    The chosen min_length is then raised by length_margin so headings slightly
+    longer than any seen in training are not dropped.
+    """
+    headings = [item for item in training_data if item['label'] != 'TEXT']
+    best_rules, best_skipped = None, -1
+
+    for max_relative_size in (1.0, 1.05, 1.1, 1.2):
+        for skip_lowercase_start in ((True, False) if allow_lowercase_skip else (False,)):
+            for min_length in range(20, 205, 5):
+                rules = {
+                    'min_length': min_length,
+                    'max_relative_size': max_relative_size,
+                    'skip_lowercase_start': skip_lowercase_start,
+                }
+                missed = sum(1 for item in headings if is_confident_body_text(item, rules))
+                recall = 1 - missed / len(headings) if headings else 1.0
+                if recall < min_heading_recall:
+                    continue
+                skipped = sum(1 for item in training_data if is_confident_body_text(item, rules))
+                if skipped > best_skipped:
+                    best_rules, best_skipped = rules, skipped
+
+    if best_rules is None:
+        # Nothing meets the recall target; a negative size bound disables the
+        # prefilter rather than letting it drop headings.
+        best_rules = dict(DISABLED_CASCADE)
+    else:
+        best_rules['min_length'] += length_margin
+
+    missed = sum(1 for item in headings if is_confident_body_text(item, best_rules))
+    best_rules['train_heading_recall'] = 1 - missed / len(headings) if headings else 1.0
+    skipped = sum(1 for item in training_data if is_confident_body_text(item, best_rules))
+    best_rules['skipped_fraction'] = skipped / len(training_data) if training_data else 0.0
+    return best_rules
+
+def cross_validate_cascade(training_data, min_heading_recall, **fit_options):
     """
-    Automates data creation and trains the Random Forest classifier.
+    Leave-one-document-out estimate of how the fitted prefilter behaves on
+    unseen PDFs: rules are chosen without each document and then applied to it.
+    Returns the pooled held-out heading recall and skipped fraction, or None
+    when the data does not cover at least two documents.
+    """
+    documents = sorted({item.get('document') for item in training_data} - {None})
+    if len(documents) < 2:
+        return None
+
+    headings = missed = skipped = 0
+    for held_out in documents:
+        rules = fit_cascade([item for item in training_data if item.get('document') != held_out], min_heading_recall, **fit_options)
+        for item in training_data:
+            if item.get('document') != held_out:
+                continue
+            dropped = is_confident_body_text(item, rules)
+            skipped += dropped
+            if item['label'] != 'TEXT':
+                headings += 1
+                missed += dropped
+
+    held_out_lines = sum(1 for item in training_data if item.get('document') in documents)
+    return 1 - missed / headings if headings else 1.0, skipped / held_out_lines
+
+def select_cascade(training_data, min_heading_recall):
+    """
+    Picks the length margin and lowercase rule by leave-one-document-out recall
+    instead of in-sample recall: among the settings whose held-out heading recall
+    meets the target, the one skipping the most held-out lines is fitted on all
+    the data. Returns (rules, held-out skipped fraction); the rules are disabled
+    when no setting reaches the target.
+    """
+    best = None
+    for length_margin in range(0, 55, 5):
+        for allow_lowercase_skip in (True, False):
+            held_out = cross_validate_cascade(training_data, min_heading_recall, length_margin=length_margin,
+                                              allow_lowercase_skip=allow_lowercase_skip)
+            if held_out is None:
+                return None
+            recall, skipped = held_out
+            if recall >= min_heading_recall and (best is None or skipped > best[0]):
+                best = (skipped, recall, length_margin, allow_lowercase_skip)
+
+    if best is None:
+        return dict(DISABLED_CASCADE, train_heading_recall=1.0, skipped_fraction=0.0, heading_recall=1.0), 0.0
+
+    skipped, recall, length_margin, allow_lowercase_skip = best
+    rules = fit_cascade(training_data, min_heading_recall, length_margin=length_margin,
+                        allow_lowercase_skip=allow_lowercase_skip)
+    rules['length_margin'] = length_margin
+    rules['heading_recall'] = recall
+    return rules, skipped
+
+def report_cascade_speedup(pipeline, training_data, rules, pdf_dir, repeats=5):
+    """
+    Times featurization + prediction over the training lines with and without
+    the prefilter, then adds the time to parse the training PDFs once to give
+    the end-to-end speedup per document as well.
+    """
+    def full():
+        pipeline.predict([extract_features(item) for item in training_data])
+
+    def cascaded():
+        candidates = [item for item in training_data if not is_confident_body_text(item, rules)]
+        if candidates:
+            pipeline.predict([extract_features(item) for item in candidates])
+
+    timings = []
+    for run in (full, cascaded):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            run()
+        timings.append((time.perf_counter() - start) / repeats)
+
+    start = time.perf_counter()
+    for pdf_file in sorted(os.listdir(pdf_dir)):
+        if pdf_file.endswith('.pdf'):
+            get_line_data_from_pdf(os.path.join(pdf_dir, pdf_file))
+    parsing = time.perf_counter() - start
+
+    print(f"Forest only: {timings[0] * 1000:.1f} ms, cascade: {timings[1] * 1000:.1f} ms "
+          f"({timings[0] / timings[1]:.2f}x speedup)")
+    print(f"End to end with {parsing * 1000:.1f} ms of parsing: {(parsing + timings[0]) * 1000:.1f} ms vs "
+          f"{(parsing + timings[1]) * 1000:.1f} ms ({(parsing + timings[0]) / (parsing + timings[1]):.2f}x speedup)")
+
+def export_shared_forest(pipeline, export_dir):
+    """
+    Flattens the forest's trees into one set of node arrays saved as .npy files,
+    which inference workers memory-map read-only instead of unpickling the model.
+    Leaf probabilities are stored pre-normalized, as predict_proba computes them.
+    """
+    vectorizer = pipeline.named_steps['dictvectorizer']
+    forest = pipeline.named_steps['randomforestclassifier']
+
+    left, right, feature, threshold, proba, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(tree.feature)
+        threshold.append(tree.threshold)
+        values = tree.value[:, 0, :].astype(np.float64)
+        normalizer = values.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        proba.append(values / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+
+    os.makedirs(export_dir, exist_ok=True)
+    arrays = {
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'proba': np.concatenate(proba),
+        'roots': np.array(roots, dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(export_dir, f"{name}.npy"), array)
+    with open(os.path.join(export_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'feature_names': list(vectorizer.feature_names_),
+            'classes': [str(c) for c in forest.classes_],
+            'max_depth': max(estimator.tree_.max_depth for estimator in forest.estimators_),
+        }, f, indent=4)
+
+def train_model(data_dir, model_path, cascade_path=None, min_heading_recall=0.99):
+    """
+    Automates data creation and trains the Random Forest classifier together
+    with the cheap body-text prefilter that runs in front of it.
     """
     print("--- Starting Model Training ---")
     
@@ -43,10 +222,44 @@ def train_model(data_dir, model_path):
     with open(model_path, 'wb') as f:
         pickle.dump(pipeline, f)
     print(f"Model saved successfully to {model_path}")
+    shared_dir = os.path.join(os.path.dirname(model_path), 'shared_forest')
+    export_shared_forest(pipeline, shared_dir)
+    print(f"Node arrays for shared-memory hosting exported to {shared_dir}")
+    # The export relies on sklearn's tree_.value layout; check the mapped model agrees
+    mismatches = int(np.sum(SharedForestModel(shared_dir).predict(X_dicts) != pipeline.predict(X_dicts)))
+    assert mismatches == 0, f"Shared-memory model disagrees with the pipeline on {mismatches} training lines"
+    print("Shared-memory model predictions match the pipeline on all training lines.")
+
+    # 5. Fit the cascade prefilter so only heading candidates reach the forest
+    print(f"\nStep 5: Fitting the cascade prefilter (heading recall >= {min_heading_recall})...")
+    cascade_path = cascade_path or os.path.join(os.path.dirname(model_path), 'cascade_rules.json')
+    selected = select_cascade(training_data, min_heading_recall)
+    if selected is None:
+        print("Warning: training data has no document names; using in-sample recall only.")
+        rules = fit_cascade(training_data, min_heading_recall)
+        rules['heading_recall'] = rules['train_heading_recall']
+    else:
+        rules, held_out_skipped = selected
+        if rules['max_relative_size'] < 0:
+            print(f"No prefilter keeps held-out heading recall >= {min_heading_recall:.1%}; saving disabled rules.")
+        else:
+            print(f"Leave-one-document-out: heading recall {rules['heading_recall']:.1%}, "
+                  f"{held_out_skipped:.1%} of lines skipped (length margin {rules['length_margin']}).")
+    rules['min_heading_recall'] = min_heading_recall
+    print(f"Prefilter skips {rules['skipped_fraction']:.1%} of training lines "
+          f"with heading recall {rules['train_heading_recall']:.1%} (in-sample).")
+    report_cascade_speedup(pipeline, training_data, rules, os.path.join(data_dir, 'pdfs'))
+    with open(cascade_path, 'w') as f:
+        json.dump(rules, f, indent=4)
+    print(f"Cascade rules saved successfully to {cascade_path}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the line classifier and its cascade prefilter.")
+    parser.add_argument('--min-heading-recall', type=float, default=0.99,
+                        help="Minimum recall on heading labels the prefilter must keep.")
+    args = parser.parse_args()
     try:
-        train_model('data', 'models/doc_classifier.pkl')
+        train_model('data', 'models/doc_classifier.pkl', min_heading_recall=args.min_heading_recall)
         print("\n--- Training Script Finished Successfully! ---")
     except Exception as e:
         print(f"\n--- AN ERROR OCCURRED: {e} ---")